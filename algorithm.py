@@ -1,7 +1,60 @@
 # algorithm.py
 
-import networkx as nx
-from routing import nearest_node
+import warnings
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+from routing import (
+    nearest_node, nearest_nodes_bulk, graph_csr, graph_csr_reversed, graph_igraph,
+    path_from_predecessors, cugraph_available, cugraph_sssp,
+)
+
+def meters_to_minutes(length_m, speed_kmph=40):
+    """Convert route length(s) in meters to minutes at the given speed. Works on scalars and arrays."""
+    return np.asarray(length_m, dtype=float) / 1000 / speed_kmph * 60
+
+# set after the first failed cugraph call so later sweeps go straight to csgraph
+_gpu_failed = False
+
+def _scatter_sssp(vertex, distance, predecessor, source, n):
+    """
+    Scatter one cugraph.sssp result into dense (dist, pred) arrays of length n, matching csgraph:
+    unreachable vertices (and vertices cugraph did not report) get dist inf and pred -1.
+    """
+    dist = np.full(n, np.inf)
+    pred = np.full(n, -1, dtype=np.int64)
+    # cugraph reports unreachable vertices with predecessor -1 and a max-float distance
+    reached = (predecessor >= 0) | (vertex == source)
+    dist[vertex[reached]] = distance[reached]
+    pred[vertex[reached]] = predecessor[reached]
+    return dist, pred
+
+def shortest_path_tree(G, sources, reverse=False):
+    """
+    One-to-many Dijkstra from node index (or array of indices) sources, over reversed edges if reverse.
+    Returns (dist, pred) shaped like scipy.sparse.csgraph.dijkstra output; unreachable nodes have
+    dist inf and pred < 0. Runs on the GPU with cugraph when it is installed, else (or if the GPU
+    call fails, with a warning, after which the GPU is not tried again) on the CSR with csgraph.
+    """
+    global _gpu_failed
+    if cugraph_available and not _gpu_failed:
+        n = len(graph_csr(G)[1])
+        try:
+            dists, preds = [], []
+            for s in np.atleast_1d(sources):
+                df = cugraph_sssp(G, s, reverse)
+                dist, pred = _scatter_sssp(
+                    df["vertex"].to_numpy(), df["distance"].to_numpy(), df["predecessor"].to_numpy(), s, n
+                )
+                dists.append(dist)
+                preds.append(pred)
+            if np.ndim(sources) == 0:
+                return dists[0], preds[0]
+            return np.vstack(dists), np.vstack(preds)
+        except Exception as e:
+            _gpu_failed = True
+            warnings.warn(f"cugraph shortest paths failed ({e!r}); using scipy csgraph from now on", RuntimeWarning)
+    csr = graph_csr_reversed(G) if reverse else graph_csr(G)[0]
+    return dijkstra(csr, indices=sources, return_predecessors=True)
 
 def route_eta_minutes(G, source, target, speed_kmph=40):
     """
@@ -9,47 +62,90 @@ def route_eta_minutes(G, source, target, speed_kmph=40):
     speed_kmph: assumed average ambulance speed.
     """
     try:
-        route = nx.shortest_path(G, source, target, weight="length")
-        length_m = nx.path_weight(G, route, weight="length")
-        time_hr = (length_m / 1000) / speed_kmph
-        time_min = time_hr * 60
-        return time_min, route
+        csr, node_list, node_idx = graph_csr(G)
+        src, dst = node_idx[source], node_idx[target]
+        with warnings.catch_warnings():
+            # igraph warns about unreachable targets; an empty path already says so
+            warnings.simplefilter("ignore", RuntimeWarning)
+            epath = graph_igraph(G).get_shortest_paths(src, to=dst, weights="length", output="epath")[0]
+        if not epath and src != dst:
+            return float("inf"), None
+        # edge ids index csr.data (lengths) and csr.indices (edge heads) directly
+        length_m = csr.data[epath].sum()
+        route = [src] + csr.indices[epath].tolist()
+        return float(meters_to_minutes(length_m, speed_kmph)), [node_list[i] for i in route]
     except Exception:
         return float("inf"), None
 
 
-def select_ambulance_and_hospital(G, ambulances, incident, hospitals_gdf):
+def hospital_sweeps(G, hospitals_gdf):
+    """
+    Run one Dijkstra sweep into each hospital (over reversed edges) and return them as a dict:
+    hosp_idx (node index per hospital), dist and pred ((n_hosp, n_nodes) arrays).
+    dist[h, x] is the road distance from node x to hospital h. Hospitals stay fixed while the
+    incident moves, so the result can be computed once per hospital set and reused.
+    """
+    _, _, node_idx = graph_csr(G)
+    hosp_nodes = nearest_nodes_bulk(G, hospitals_gdf.geometry.x.values, hospitals_gdf.geometry.y.values)
+    hosp_idx = np.asarray([node_idx[n] for n in hosp_nodes], dtype=np.int64)
+    if len(hosp_idx) == 0:
+        n = len(node_idx)
+        return {"hosp_idx": hosp_idx, "dist": np.empty((0, n)), "pred": np.empty((0, n), dtype=np.int32)}
+    dist, pred = shortest_path_tree(G, hosp_idx, reverse=True)
+    return {"hosp_idx": hosp_idx, "dist": dist, "pred": pred}
+
+
+def select_ambulance_and_hospital(G, ambulances, incident, hospitals_gdf, speed_kmph=40, hosp_sweeps=None):
     """
     Select best ambulance-hospital using ETA in minutes.
     All nodes used are from G (which is Surat graph), so ambulances and incident are in Surat.
+    Routes are returned as arrays of node indices into G.graph["node_list"] (see indices_to_latlon).
+    The incident is the common endpoint of every candidate route, so one Dijkstra sweep on the
+    reversed graph covers all ambulances and one on G covers all hospitals.
+    hosp_sweeps: optional result of hospital_sweeps for hospitals_gdf; the hospital choice
+    then becomes a lookup with no Dijkstra run.
     """
     # find nearest graph node to incident location
     inc_node = nearest_node(G, incident["lon"], incident["lat"])
-    
-    best_amb = None
-    best_time = float("inf")
-    best_route_to_inc = None
-    # find best ambulance to incident
-    for amb in ambulances:
-        t, route = route_eta_minutes(G, amb["node"], inc_node)
-        if t < best_time:
-            best_time = t
-            best_amb = amb
-            best_route_to_inc = route
-
-    if best_amb is None:
+    _, _, node_idx = graph_csr(G)
+    inc = node_idx[inc_node]
+
+    if not ambulances:
+        return None, None, None, None, None, None
+
+    # ambulance -> incident: single sweep from the incident over reversed edges
+    amb_dist, amb_pred = shortest_path_tree(G, inc, reverse=True)
+    amb_idx = [node_idx[amb["node"]] for amb in ambulances]
+    amb_times = meters_to_minutes(amb_dist[amb_idx], speed_kmph)
+    i = int(np.argmin(amb_times))
+    if not np.isfinite(amb_times[i]):
         return None, None, None, None, None, None
+    best_amb = ambulances[i]
+    best_time = float(amb_times[i])
+    # paths in the reversed graph run incident -> ambulance
+    best_route_to_inc = path_from_predecessors(amb_pred, amb_idx[i])[::-1]
 
-    # find best hospital from incident
     best_hosp = None
     best_hosp_time = float("inf")
     best_route_inc_hosp = None
-    for idx, row in hospitals_gdf.iterrows():
-        hosp_node = nearest_node(G, row.geometry.x, row.geometry.y)
-        t_h, route_h = route_eta_minutes(G, inc_node, hosp_node)
-        if t_h < best_hosp_time:
-            best_hosp_time = t_h
-            best_hosp = row
-            best_route_inc_hosp = route_h
+    if hosp_sweeps is not None:
+        # precomputed sweeps into each hospital: read off the incident's column
+        hosp_times = meters_to_minutes(hosp_sweeps["dist"][:, inc], speed_kmph)
+    else:
+        # incident -> hospital: single sweep from the incident
+        hosp_dist, hosp_pred = shortest_path_tree(G, inc)
+        hosp_nodes = nearest_nodes_bulk(G, hospitals_gdf.geometry.x.values, hospitals_gdf.geometry.y.values)
+        hosp_idx = [node_idx[n] for n in hosp_nodes]
+        hosp_times = meters_to_minutes(hosp_dist[hosp_idx], speed_kmph)
+    if len(hosp_times):
+        j = int(np.argmin(hosp_times))
+        if np.isfinite(hosp_times[j]):
+            best_hosp = hospitals_gdf.iloc[j]
+            best_hosp_time = float(hosp_times[j])
+            if hosp_sweeps is not None:
+                # paths in the reversed graph run hospital -> incident
+                best_route_inc_hosp = path_from_predecessors(hosp_sweeps["pred"][j], inc)[::-1]
+            else:
+                best_route_inc_hosp = path_from_predecessors(hosp_pred, hosp_idx[j])
 
     return best_amb, best_hosp, best_route_to_inc, best_route_inc_hosp, best_time, best_hosp_time
@@ -1,7 +1,7 @@
 # app.py
 import streamlit as st
-from routing import load_graph, nearest_node, nodes_to_latlon, load_hospitals_with_fallback
-from algorithm import select_ambulance_and_hospital, route_eta_minutes
+from routing import load_graph, nearest_node, indices_to_latlon, load_hospitals_with_fallback, nearest_hospital, graph_center
+from algorithm import select_ambulance_and_hospital, route_eta_minutes, hospital_sweeps
 import folium
 from streamlit_folium import st_folium
 import random
@@ -33,6 +33,16 @@ def reset_scenario():
     incident = {"id": "I1", "lon": inc_lon, "lat": inc_lat, "status": "unassigned"}
 
     hospitals = load_hospitals_with_fallback(PLACE, G, min_count=5)
+    # sweeps into each hospital only depend on the hospitals, so keep them while those are unchanged;
+    # dummy hospitals are redrawn on every reset, where one sweep from the incident is cheaper
+    prev = st.session_state.get("hospitals")
+    if hospitals.attrs.get("dummy"):
+        st.session_state["hosp_sweeps"] = None
+    elif (
+        prev is None or st.session_state.get("hosp_sweeps") is None
+        or not prev.geometry.equals(hospitals.geometry)
+    ):
+        st.session_state["hosp_sweeps"] = hospital_sweeps(G, hospitals)
 
     st.session_state["ambulances"] = ambulances
     st.session_state["incident"] = incident
@@ -51,7 +61,8 @@ if "ambulances" not in st.session_state:
 # Run greedy selection
 if "assigned" not in st.session_state and "ambulances" in st.session_state:
     best_amb, best_hosp, route_to_inc, route_inc_hosp, t_amb, t_hosp = select_ambulance_and_hospital(
-        G, st.session_state["ambulances"], st.session_state["incident"], st.session_state["hospitals"]
+        G, st.session_state["ambulances"], st.session_state["incident"], st.session_state["hospitals"],
+        hosp_sweeps=st.session_state.get("hosp_sweeps"),
     )
     if best_amb is not None:
         best_amb["status"] = "dispatched"
@@ -65,15 +76,19 @@ if "assigned" not in st.session_state and "ambulances" in st.session_state:
         st.success(f"🚑 Ambulance {best_amb['id']} assigned (ETA {t_amb:.1f} min) → hospital {best_amb['hospital_name']} (ETA {t_hosp:.1f} min)")
 
 # Map
-xs = [G.nodes[n]['x'] for n in G.nodes]
-ys = [G.nodes[n]['y'] for n in G.nodes]
-m = folium.Map(location=[sum(ys)/len(ys), sum(xs)/len(xs)], zoom_start=12)
+mean_lat, mean_lon = graph_center(G)
+m = folium.Map(location=[mean_lat, mean_lon], zoom_start=12)
 
 # Hospitals
-for idx, row in st.session_state["hospitals"].iterrows():
+hospitals = st.session_state["hospitals"]
+if "name" in hospitals.columns:
+    hosp_names = hospitals["name"].fillna("Hospital").tolist()
+else:
+    hosp_names = ["Hospital"] * len(hospitals)
+for lat, lon, name in zip(hospitals.geometry.y.values.tolist(), hospitals.geometry.x.values.tolist(), hosp_names):
     folium.Marker(
-        [row.geometry.y, row.geometry.x],
-        popup=str(row.get("name", "Hospital")),
+        [lat, lon],
+        popup=str(name),
         icon=folium.Icon(color="green", icon="plus-sign"),
     ).add_to(m)
 
@@ -86,18 +101,22 @@ for amb in st.session_state["ambulances"]:
         icon=folium.Icon(color="blue" if amb["status"] == "available" else "red", icon="ambulance", prefix="fa"),
     ).add_to(m)
 
-    if amb.get("status") == "dispatched" and amb.get("route_to_inc"):
-        coords = nodes_to_latlon(G, amb["route_to_inc"])
+    if amb.get("status") == "dispatched" and amb.get("route_to_inc") is not None:
+        coords = indices_to_latlon(G, amb["route_to_inc"])
         folium.PolyLine(coords, weight=5, color="red").add_to(m)
-    if amb.get("status") == "dispatched" and amb.get("route_to_hosp"):
-        coords = nodes_to_latlon(G, amb["route_to_hosp"])
+    if amb.get("status") == "dispatched" and amb.get("route_to_hosp") is not None:
+        coords = indices_to_latlon(G, amb["route_to_hosp"])
         folium.PolyLine(coords, weight=4, color="green", dash_array="5").add_to(m)
 
 # Incident
 inc = st.session_state["incident"]
+inc_popup = f'{inc["id"]} ({inc["status"]})'
+closest = nearest_hospital(hospitals, inc["lon"], inc["lat"])
+if closest is not None:
+    inc_popup += f" - closest hospital (straight-line): {hosp_names[closest]}"
 folium.Marker(
     [inc["lat"], inc["lon"]],
-    popup=f'{inc["id"]} ({inc["status"]})',
+    popup=inc_popup,
     icon=folium.Icon(color="orange", icon="exclamation-triangle", prefix="fa"),
 ).add_to(m)
 
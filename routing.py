@@ -1,33 +1,304 @@
 # routing.py
 import osmnx as ox
 import geopandas as gpd
+import hashlib
+import numpy as np
+import os
+import pickle
 import random
+import requests
+from scipy.sparse import csr_matrix, load_npz, save_npz
+from scipy.spatial import cKDTree
+from osmnx._errors import InsufficientResponseError, ResponseStatusCodeError
+from shapely.geometry import Point, box
+
+try:
+    # optional GPU backend for one-to-many sweeps
+    import cudf
+    import cugraph
+    cugraph_available = True
+except ImportError:
+    cugraph_available = False
+
+GRAPH_FILE = "surat_graph.gpickle"
+CSR_FILE = "surat_graph_csr.npz"
+NODE_LIST_FILE = "node_list.npy"
+CSR_FINGERPRINT_FILE = "surat_graph_csr.sha1"
+HOSPITALS_FILE = "surat_hospitals.geojson"
+CITY_FILE = "surat_boundary.geojson"
+CONSOLIDATE_TOLERANCE = 15  # meters
 
 def load_graph(place="Surat, India"):
-    """Load drivable street graph for given place."""
-    G = ox.graph_from_place(place, network_type="drive")
+    """
+    Load drivable street graph for given place.
+    The graph and its CSR adjacency are cached on disk, so warm starts skip the OSM download
+    and the per-edge CSR build. The CSR cache is rebuilt whenever the graph file is newer
+    or the fingerprint saved with it does not match the graph (see graph_fingerprint).
+    The cached graph is already contracted (see contract_graph).
+    """
+    G = None
+    if os.path.exists(GRAPH_FILE):
+        with open(GRAPH_FILE, "rb") as f:
+            G = pickle.load(f)
+        if (
+            G.graph.get("place") != place
+            or G.graph.get("consolidate_tolerance") != CONSOLIDATE_TOLERANCE
+            or not G.graph.get("consolidate_dead_ends")
+        ):
+            G = None
+    if G is None:
+        boundary = load_city_boundary(place)
+        G = contract_graph(ox.graph_from_polygon(boundary.geometry.iloc[0], network_type="drive"))
+        G.graph["place"] = place
+        graph_fingerprint(G)
+        with open(GRAPH_FILE, "wb") as f:
+            pickle.dump(G, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    csr_fresh = (
+        os.path.exists(CSR_FILE) and os.path.exists(NODE_LIST_FILE) and os.path.exists(CSR_FINGERPRINT_FILE)
+        and os.path.getmtime(CSR_FILE) >= os.path.getmtime(GRAPH_FILE)
+    )
+    if csr_fresh:
+        # mtimes are not preserved by every copy/checkout; make sure the cache describes this graph
+        with open(CSR_FINGERPRINT_FILE) as f:
+            csr_fresh = f.read().strip() == graph_fingerprint(G)
+    if csr_fresh:
+        node_list = np.load(NODE_LIST_FILE).tolist()
+        csr = load_npz(CSR_FILE).tocsr()
+        csr_fresh = len(node_list) == G.number_of_nodes() == csr.shape[0] == csr.shape[1]
+    if csr_fresh:
+        G.graph["csr"] = csr
+        G.graph["node_list"] = node_list
+        G.graph["node_idx"] = {n: i for i, n in enumerate(node_list)}
+    else:
+        csr, node_list, _ = graph_csr(G)
+        save_npz(CSR_FILE, csr)
+        np.save(NODE_LIST_FILE, np.asarray(node_list))
+        with open(CSR_FINGERPRINT_FILE, "w") as f:
+            f.write(graph_fingerprint(G))
+    graph_kdtree(G)
+    graph_xy(G)
     return G
 
+def graph_fingerprint(G):
+    """
+    SHA-1 over G's place, consolidation settings, node order and (u, v, length) edge list,
+    cached on G.graph (and so pickled with the graph). Identifies which graph a CSR cache was built from.
+    """
+    if "fingerprint" not in G.graph:
+        h = hashlib.sha1()
+        h.update(repr((G.graph.get("place"), G.graph.get("consolidate_tolerance"), G.graph.get("consolidate_dead_ends"))).encode())
+        h.update(np.asarray(list(G.nodes), dtype=np.int64).tobytes())
+        h.update(np.asarray(list(G.edges(data="length", default=0.0)), dtype=np.float64).tobytes())
+        G.graph["fingerprint"] = h.hexdigest()
+    return G.graph["fingerprint"]
+
+def _read_cached_gdf(path, place):
+    """Read a GeoJSON cache written for `place`, or return None if it is missing or for another place."""
+    if not os.path.exists(path):
+        return None
+    gdf = gpd.read_file(path)
+    if gdf.empty or "place" not in gdf.columns or not (gdf["place"] == place).all():
+        return None
+    return gdf.drop(columns="place")
+
+def load_city_boundary(place):
+    """City boundary polygon as a GeoDataFrame, from CITY_FILE if cached, else geocoded once and saved."""
+    gdf = _read_cached_gdf(CITY_FILE, place)
+    if gdf is None:
+        gdf = ox.geocode_to_gdf(place).to_crs("EPSG:4326")[["geometry"]]
+        gdf.assign(place=place).to_file(CITY_FILE, driver="GeoJSON")
+    return gdf
+
+def contract_graph(G, tolerance=CONSOLIDATE_TOLERANCE):
+    """
+    Merge clusters of nodes within `tolerance` meters into single intersections.
+    graph_from_place already removes degree-2 chain nodes, so this collapses what is left:
+    dual-carriageway crossings, roundabouts and slip-road junctions. Edge lengths are
+    recomputed from the rebuilt geometry. Dead-end nodes are kept so cul-de-sacs stay routable.
+    Returns an unprojected (lat/lon) graph.
+    """
+    Gp = ox.project_graph(G)
+    Gc = ox.simplification.consolidate_intersections(Gp, tolerance=tolerance, rebuild_graph=True, dead_ends=True)
+    Gc = ox.project_graph(Gc, to_latlong=True)
+    Gc.graph["consolidate_tolerance"] = tolerance
+    Gc.graph["consolidate_dead_ends"] = True
+    return Gc
+
+def graph_csr(G, weight="length"):
+    """
+    Return (csr, node_list, node_idx) for G, building and caching it on G.graph on first use.
+    csr[i, j] holds the minimum weight over parallel edges from node_list[i] to node_list[j].
+    """
+    if "csr" not in G.graph:
+        node_list = list(G.nodes)
+        node_idx = {n: i for i, n in enumerate(node_list)}
+        n = len(node_list)
+        u, v, w = [], [], []
+        for a, b, length in G.edges(data=weight, default=0.0):
+            if a != b:
+                u.append(node_idx[a])
+                v.append(node_idx[b])
+                w.append(length)
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
+        w = np.asarray(w, dtype=float)
+        # keep only the cheapest of any parallel edges (csr_matrix would sum them)
+        order = np.lexsort((w, v, u))
+        u, v, w = u[order], v[order], w[order]
+        first = np.ones(len(u), dtype=bool)
+        first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+        csr = csr_matrix((w[first], (u[first], v[first])), shape=(n, n))
+        G.graph["csr"] = csr
+        G.graph["node_list"] = node_list
+        G.graph["node_idx"] = node_idx
+    return G.graph["csr"], G.graph["node_list"], G.graph["node_idx"]
+
+def graph_igraph(G):
+    """
+    Return an igraph.Graph over the CSR, cached on G.graph. Vertex ids are CSR row indices and
+    edge ids follow csr.data order, so csr.data / csr.indices can be indexed by edge id.
+    """
+    if "ig" not in G.graph:
+        import igraph
+        csr, _, _ = graph_csr(G)
+        coo = csr.tocoo()
+        ig = igraph.Graph(n=csr.shape[0], edges=np.column_stack([coo.row, coo.col]).tolist(), directed=True)
+        ig.es["length"] = coo.data.tolist()
+        G.graph["ig"] = ig
+    return G.graph["ig"]
+
+def graph_csr_reversed(G):
+    """Return the CSR of G with every edge reversed, cached on G.graph."""
+    if "csr_rev" not in G.graph:
+        csr, _, _ = graph_csr(G)
+        G.graph["csr_rev"] = csr.T.tocsr()
+    return G.graph["csr_rev"]
+
+def graph_cugraph(G, reverse=False):
+    """Return a cugraph.Graph built from the (optionally reversed) CSR, cached on G.graph. Requires cugraph."""
+    key = "cugraph_rev" if reverse else "cugraph"
+    if key not in G.graph:
+        coo = (graph_csr_reversed(G) if reverse else graph_csr(G)[0]).tocoo()
+        edges = cudf.DataFrame({"src": coo.row, "dst": coo.col, "length": coo.data})
+        Gc = cugraph.Graph(directed=True)
+        Gc.from_cudf_edgelist(edges, source="src", destination="dst", edge_attr="length", renumber=False)
+        G.graph[key] = Gc
+    return G.graph[key]
+
+def cugraph_sssp(G, source, reverse=False):
+    """Run cugraph.sssp from CSR row index source; returns a pandas frame with vertex, distance and predecessor columns."""
+    return cugraph.sssp(graph_cugraph(G, reverse), source=int(source)).to_pandas()
+
+def path_from_predecessors(pred, target_idx):
+    """Walk a csgraph predecessor array back from target_idx; returns node indices from source to target."""
+    route = []
+    i = target_idx
+    while i >= 0:
+        route.append(i)
+        i = pred[i]
+    return np.asarray(route[::-1], dtype=np.int64)
+
+def graph_kdtree(G):
+    """
+    Return (tree, cos_lat) for G's nodes, building and caching it on G.graph on first use.
+    Points are equirectangular-projected (lon * cos_lat, lat), which is accurate at city scale.
+    Tree indices follow the node_list order of graph_csr.
+    """
+    if "kdtree" not in G.graph:
+        _, node_list, _ = graph_csr(G)
+        lons = np.fromiter((G.nodes[n]["x"] for n in node_list), dtype=float, count=len(node_list))
+        lats = np.fromiter((G.nodes[n]["y"] for n in node_list), dtype=float, count=len(node_list))
+        cos_lat = float(np.cos(np.radians(lats.mean())))
+        G.graph["kdtree"] = cKDTree(np.column_stack([lons * cos_lat, lats]))
+        G.graph["kdtree_cos_lat"] = cos_lat
+        G.graph["node_ids"] = np.asarray(node_list)
+    return G.graph["kdtree"], G.graph["kdtree_cos_lat"]
+
 def nearest_node(G, lon, lat):
     """Find nearest graph node to given coordinates."""
-    return ox.distance.nearest_nodes(G, lon, lat)
+    tree, cos_lat = graph_kdtree(G)
+    _, i = tree.query((lon * cos_lat, lat))
+    return G.graph["node_list"][i]
+
+def nearest_nodes_bulk(G, lons, lats):
+    """Find nearest graph nodes for arrays of coordinates in one tree query. Returns an ndarray of node ids."""
+    tree, cos_lat = graph_kdtree(G)
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    _, i = tree.query(np.column_stack([lons * cos_lat, lats]))
+    return G.graph["node_ids"][i]
+
+def graph_xy(G):
+    """Return a (n, 2) float32 array of (lat, lon) per node in node_list order, cached on G.graph."""
+    if "xy" not in G.graph:
+        _, node_list, _ = graph_csr(G)
+        G.graph["xy"] = np.array([(G.nodes[n]["y"], G.nodes[n]["x"]) for n in node_list], dtype=np.float32)
+    return G.graph["xy"]
+
+def graph_center(G):
+    """Mean (lat, lon) of all graph nodes, cached on G.graph."""
+    if "center" not in G.graph:
+        center = graph_xy(G).mean(axis=0, dtype=np.float64)
+        G.graph["center"] = (float(center[0]), float(center[1]))
+    return G.graph["center"]
+
+def indices_to_latlon(G, route_idx):
+    """Convert an array of node indices (as returned by path_from_predecessors) to lat/lon coordinates for mapping."""
+    return graph_xy(G)[np.asarray(route_idx, dtype=np.int64)].tolist()
 
 def nodes_to_latlon(G, nodes):
     """Convert node list to lat/lon coordinates for mapping."""
-    return [(G.nodes[n]["y"], G.nodes[n]["x"]) for n in nodes]
+    _, _, node_idx = graph_csr(G)
+    return indices_to_latlon(G, [node_idx[n] for n in nodes])
+
+def nearest_hospital(hospitals_gdf, lon, lat):
+    """
+    Position (for .iloc) of the straight-line nearest hospital to given coordinates, via the
+    frame's STRtree spatial index. Distances are equirectangular (longitude scaled by cos(lat))
+    as in graph_kdtree. Returns None if there are no hospitals.
+    """
+    if hospitals_gdf.empty:
+        return None
+    cos_lat = float(np.cos(np.radians(lat)))
+    xs = hospitals_gdf.geometry.x.values
+    ys = hospitals_gdf.geometry.y.values
+    # the nearest hospital in raw degrees bounds the true nearest; search the box that bound covers
+    _, tree_idx = hospitals_gdf.sindex.nearest(Point(lon, lat))
+    i = int(tree_idx[0])
+    r = np.hypot((xs[i] - lon) * cos_lat, ys[i] - lat)
+    cand = np.sort(hospitals_gdf.sindex.query(box(lon - r / cos_lat, lat - r, lon + r / cos_lat, lat + r)))
+    if len(cand) == 0:
+        return i
+    d = np.hypot((xs[cand] - lon) * cos_lat, ys[cand] - lat)
+    return int(cand[np.argmin(d)])
 
 def load_hospitals_with_fallback(place, G, min_count=5):
-    """Load hospitals inside the city boundary. Ensure at least min_count exist."""
+    """
+    Load hospitals inside the city boundary. Ensure at least min_count exist.
+    Hospitals fetched from OSM are saved to HOSPITALS_FILE and read from there on later runs.
+    Random fallback hospitals are flagged with gdf.attrs["dummy"] = True.
+    The returned frame's STRtree spatial index (gdf.sindex) is built up front.
+    """
+    gdf = _read_cached_gdf(HOSPITALS_FILE, place)
+    if gdf is not None:
+        gdf.sindex  # build the STRtree now rather than on first query
+        return gdf
     try:
         tags = {"amenity": "hospital"}
-        gdf = ox.geometries_from_place(place, tags)
+        gdf = ox.features_from_polygon(load_city_boundary(place).geometry.iloc[0], tags)
         if not gdf.empty:
             gdf = gdf.to_crs("EPSG:4326")  # lat/lon
             gdf = gdf[gdf.geometry.type == "Point"]
             if len(gdf) > min_count:
                 gdf = gdf.sample(min_count, random_state=42)
-            return gdf
-    except Exception:
+            gdf = gdf[[c for c in ("name", "geometry") if c in gdf.columns]].reset_index(drop=True)
+            if not gdf.empty:
+                gdf.assign(place=place).to_file(HOSPITALS_FILE, driver="GeoJSON")
+                gdf.sindex  # build the STRtree now rather than on first query
+                return gdf
+    except (InsufficientResponseError, ResponseStatusCodeError, requests.RequestException):
+        # no hospitals tagged in the polygon, or OSM unreachable
         pass
     # fallback: pick random nodes as dummy hospitals
     nodes = list(G.nodes())
@@ -38,4 +309,7 @@ def load_hospitals_with_fallback(place, G, min_count=5):
             "name": f"Hospital {i+1}",
             "geometry": gpd.points_from_xy([G.nodes[n]['x']], [G.nodes[n]['y']])[0]
         })
-    return gpd.GeoDataFrame(rows, crs="EPSG:4326")
+    gdf = gpd.GeoDataFrame(rows, crs="EPSG:4326")
+    gdf.attrs["dummy"] = True  # redrawn at random on every call
+    gdf.sindex  # build the STRtree now rather than on first query
+    return gdf
@@ -0,0 +1,192 @@
+# test_algorithm.py
+import warnings
+
+import networkx as nx
+import numpy as np
+import geopandas as gpd
+import pandas as pd
+import pytest
+from scipy.sparse import load_npz, save_npz
+from scipy.sparse.csgraph import dijkstra
+
+import algorithm
+from shapely.geometry import Point
+from routing import graph_csr, graph_igraph, nearest_hospital
+
+
+def small_graph():
+    G = nx.MultiDiGraph()
+    G.add_edge(10, 11, length=5.0)
+    G.add_edge(11, 12, length=2.0)
+    G.add_edge(10, 12, length=9.0)
+    G.add_edge(12, 10, length=1.0)
+    G.add_node(13)  # unreachable from everything
+    return G
+
+
+def dispatch_graph():
+    """
+    Ambulances 1 and 4, incident 3, hospitals 5 and 6 along a street, with one-way-ish lengths:
+    reading any leg in the wrong direction picks the other ambulance or hospital.
+    """
+    G = nx.MultiDiGraph()
+    for n in range(1, 7):
+        G.add_node(n, x=72.80 + 0.01 * n, y=21.17)
+    G.add_edge(1, 2, length=40.0)
+    G.add_edge(1, 2, length=90.0)  # parallel, longer
+    G.add_edge(2, 3, length=60.0)
+    G.add_edge(1, 3, length=150.0)
+    G.add_edge(3, 1, length=1000.0)
+    G.add_edge(4, 3, length=500.0)
+    G.add_edge(3, 4, length=50.0)
+    G.add_edge(3, 5, length=800.0)
+    G.add_edge(5, 3, length=100.0)
+    G.add_edge(3, 6, length=300.0)
+    G.add_edge(3, 6, length=700.0)  # parallel, longer
+    G.add_edge(6, 3, length=900.0)
+    hospitals = gpd.GeoDataFrame(
+        {"name": ["H5", "H6"]}, geometry=[Point(72.85, 21.17), Point(72.86, 21.17)], crs="EPSG:4326"
+    )
+    ambulances = [{"id": "A1", "node": 1}, {"id": "A4", "node": 4}]
+    incident = {"lon": 72.83, "lat": 21.17}
+    return G, ambulances, incident, hospitals
+
+
+def fake_sssp(G, source, reverse=False):
+    """Build a cugraph-shaped result from csgraph, with unreachable rows and the source row cugraph reports."""
+    csr = graph_csr(G)[0]
+    if reverse:
+        csr = csr.T.tocsr()
+    dist, pred = dijkstra(csr, indices=int(source), return_predecessors=True)
+    unreached = ~np.isfinite(dist)
+    return pd.DataFrame({
+        "vertex": np.arange(len(dist)),
+        "distance": np.where(unreached, np.finfo(np.float64).max, dist),
+        "predecessor": np.where(pred < 0, -1, pred),
+    })
+
+
+def test_scatter_sssp_marks_unreachable_and_missing_vertices():
+    vertex = np.array([2, 0, 1])
+    distance = np.array([3.0, 0.0, np.finfo(np.float32).max])
+    predecessor = np.array([0, -1, -1])
+    dist, pred = algorithm._scatter_sssp(vertex, distance, predecessor, 0, 4)
+    assert dist.tolist() == [0.0, np.inf, 3.0, np.inf]
+    assert pred.tolist() == [-1, -1, 0, -1]
+
+
+def test_shortest_path_tree_gpu_path_matches_csgraph(monkeypatch):
+    G = small_graph()
+    csr = graph_csr(G)[0]
+    monkeypatch.setattr(algorithm, "cugraph_available", True)
+    monkeypatch.setattr(algorithm, "cugraph_sssp", fake_sssp)
+    monkeypatch.setattr(algorithm, "_gpu_failed", False)
+    for reverse in (False, True):
+        expected = dijkstra(csr.T.tocsr() if reverse else csr, indices=[0, 1], return_predecessors=True)
+        dist, pred = algorithm.shortest_path_tree(G, np.array([0, 1]), reverse=reverse)
+        np.testing.assert_array_equal(dist, expected[0])
+        np.testing.assert_array_equal(np.where(pred < 0, -1, pred), np.where(expected[1] < 0, -1, expected[1]))
+    dist, _ = algorithm.shortest_path_tree(G, 0)
+    assert dist.shape == (4,)
+
+
+def test_shortest_path_tree_falls_back_to_csgraph_on_gpu_error(monkeypatch):
+    G = small_graph()
+    calls = []
+
+    def broken(*args, **kwargs):
+        calls.append(args)
+        raise TypeError("sssp() got an unexpected keyword argument")
+
+    monkeypatch.setattr(algorithm, "cugraph_available", True)
+    monkeypatch.setattr(algorithm, "cugraph_sssp", broken)
+    monkeypatch.setattr(algorithm, "_gpu_failed", False)
+    with pytest.warns(RuntimeWarning, match="cugraph"):
+        dist, pred = algorithm.shortest_path_tree(G, 0)
+    assert dist.tolist() == [0.0, 5.0, 7.0, np.inf]
+    assert pred[2] == 1
+
+    # the GPU is disabled after the first failure: no second attempt, no second warning
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        dist, _ = algorithm.shortest_path_tree(G, np.array([0, 1]), reverse=True)
+    assert len(calls) == 1
+    assert dist.shape == (2, 4)
+
+
+def assert_igraph_matches_csr(G):
+    csr, node_list, _ = graph_csr(G)
+    ig = graph_igraph(G)
+    assert ig.ecount() == csr.nnz
+    rows = np.repeat(np.arange(csr.shape[0]), np.diff(csr.indptr))
+    edges = np.array(ig.get_edgelist())
+    np.testing.assert_array_equal(edges[:, 0], rows)
+    np.testing.assert_array_equal(edges[:, 1], csr.indices)
+    np.testing.assert_array_equal(ig.es["length"], csr.data)
+    expected = dijkstra(csr)
+    for i, source in enumerate(node_list):
+        for j, target in enumerate(node_list):
+            minutes, route = algorithm.route_eta_minutes(G, source, target, speed_kmph=60)
+            assert np.isclose(minutes, algorithm.meters_to_minutes(expected[i, j], 60))
+            assert (route is None) == (not np.isfinite(expected[i, j]))
+
+
+def test_igraph_edge_ids_follow_csr_order(tmp_path):
+    G = small_graph()
+    G.add_edge(10, 11, length=3.0)  # parallel edge; the shorter one must win
+    G.add_edge(11, 10, length=4.0)
+    assert_igraph_matches_csr(G)
+    assert algorithm.route_eta_minutes(G, 10, 12)[1] == [10, 11, 12]
+
+    # the same holds for a CSR loaded back from the on-disk cache
+    csr, node_list, node_idx = graph_csr(G)
+    save_npz(tmp_path / "csr.npz", csr)
+    H = G.copy()
+    for key in ("csr", "ig"):
+        H.graph.pop(key, None)
+    H.graph.update(csr=load_npz(tmp_path / "csr.npz").tocsr(), node_list=node_list, node_idx=node_idx)
+    assert_igraph_matches_csr(H)
+
+
+def test_graph_csr_keeps_shortest_parallel_edge():
+    G = dispatch_graph()[0]
+    csr, _, node_idx = graph_csr(G)
+    assert csr[node_idx[1], node_idx[2]] == 40.0
+    assert csr[node_idx[3], node_idx[6]] == 300.0
+    assert csr.nnz == 10
+
+
+def test_select_ambulance_and_hospital_follows_edge_direction():
+    G, ambulances, incident, hospitals = dispatch_graph()
+    _, node_list, _ = graph_csr(G)
+    amb, hosp, route_to_inc, route_to_hosp, amb_time, hosp_time = algorithm.select_ambulance_and_hospital(
+        G, ambulances, incident, hospitals, speed_kmph=60
+    )
+    assert amb["id"] == "A1"
+    assert [node_list[i] for i in route_to_inc] == [1, 2, 3]
+    assert amb_time == pytest.approx(algorithm.meters_to_minutes(100.0, 60))
+    assert hosp["name"] == "H6"
+    assert [node_list[i] for i in route_to_hosp] == [3, 6]
+    assert hosp_time == pytest.approx(algorithm.meters_to_minutes(300.0, 60))
+
+
+def test_select_ambulance_and_hospital_same_result_with_hospital_sweeps():
+    G, ambulances, incident, hospitals = dispatch_graph()
+    sweeps = algorithm.hospital_sweeps(G, hospitals)
+    without = algorithm.select_ambulance_and_hospital(G, ambulances, incident, hospitals, speed_kmph=60)
+    with_sweeps = algorithm.select_ambulance_and_hospital(
+        G, ambulances, incident, hospitals, speed_kmph=60, hosp_sweeps=sweeps
+    )
+    assert without[0] is with_sweeps[0]
+    assert without[1]["name"] == with_sweeps[1]["name"] == "H6"
+    np.testing.assert_array_equal(without[2], with_sweeps[2])
+    np.testing.assert_array_equal(without[3], with_sweeps[3])
+    assert without[4] == pytest.approx(with_sweeps[4])
+    assert without[5] == pytest.approx(with_sweeps[5])
+
+
+def test_nearest_hospital_scales_longitude():
+    # at 60N a degree of longitude is half a degree of latitude: 0.03 east beats 0.02 north
+    hospitals = gpd.GeoDataFrame(geometry=[Point(10.0, 60.02), Point(10.03, 60.0)], crs="EPSG:4326")
+    assert nearest_hospital(hospitals, 10.0, 60.0) == 1
+    assert nearest_hospital(hospitals.iloc[:0], 10.0, 60.0) is None